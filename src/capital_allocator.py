@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterator, Tuple
 from enum import Enum
 
 
@@ -7,23 +7,25 @@ class AllocationStrategy(Enum):
 
 
 PLATFORM_MIN_BET = 5.0
+MIN_ALLOCATION = PLATFORM_MIN_BET * 2
 
+# Indexed by the strategy_code set in calculate_arbitrage: 0 = Yes on App1/No on App2, 1 = No on App1/Yes on App2
+STRATEGY_PRICE_KEYS = (('market1_yes', 'market2_no'), ('market2_yes', 'market1_no'))
+STRATEGY_PLATFORMS = (("Polymarket", "predict.fun"), ("predict.fun", "Polymarket"))
 
-def equal_weight_allocation(opportunities: List[Dict], total_capital: float) -> List[Dict]:
+
+def equal_weight_allocation(opportunities: List[Dict], total_capital: float) -> Iterator[Tuple[Dict, float]]:
     if not opportunities:
-        return []
+        return
 
     allocation_per_opportunity = total_capital / len(opportunities)
 
-    allocations = []
-    for opp in opportunities:
-        if allocation_per_opportunity >= PLATFORM_MIN_BET * 2:
-            allocations.append({
-                'opportunity': opp,
-                'allocated_capital': allocation_per_opportunity
-            })
+    # The share is the same for every opportunity, so either all qualify or none do
+    if allocation_per_opportunity < MIN_ALLOCATION:
+        return
 
-    return allocations
+    for opp in opportunities:
+        yield opp, allocation_per_opportunity
 
 
 def calculate_bet_amounts(opp: Dict, allocated_capital: float) -> Optional[Dict]:
@@ -33,30 +35,26 @@ def calculate_bet_amounts(opp: Dict, allocated_capital: float) -> Optional[Dict]
     if not best:
         return None
 
-    strategy_type = best['type']
+    # The strategy's cost is already price_yes + price_no, computed in calculate_arbitrage
+    total_price = best['cost']
+    if total_price == 0:
+        return None
 
-    if 'Yes on App1, No on App2' in strategy_type:
-        price_yes = arb['market1_yes']
-        price_no = arb['market2_no']
-        platform_yes = "Polymarket"
-        platform_no = "predict.fun"
-    else:
-        price_yes = arb['market2_yes']
-        price_no = arb['market1_no']
-        platform_yes = "predict.fun"
-        platform_no = "Polymarket"
+    strategy_code = best['strategy_code']
+    yes_key, no_key = STRATEGY_PRICE_KEYS[strategy_code]
+    price_yes = arb[yes_key]
+    price_no = arb[no_key]
 
-    total_price = price_yes + price_no
-    if total_price == 0:
+    # The cheaper leg gets the smaller bet, so reject on it before sizing both
+    if allocated_capital * (min(price_yes, price_no) / total_price) < PLATFORM_MIN_BET:
         return None
 
     bet_yes = allocated_capital * (price_yes / total_price)
     bet_no = allocated_capital * (price_no / total_price)
+    platform_yes, platform_no = STRATEGY_PLATFORMS[strategy_code]
 
-    if bet_yes < PLATFORM_MIN_BET or bet_no < PLATFORM_MIN_BET:
-        return None
-
-    expected_profit = allocated_capital - (bet_yes * price_yes + bet_no * price_no)
+    # Both bets buy allocated_capital / total_price shares, one of which pays out $1 each
+    expected_profit = allocated_capital * (1.0 - total_price) / total_price
 
     return {
         'allocated_capital': allocated_capital,
@@ -71,27 +69,30 @@ def calculate_bet_amounts(opp: Dict, allocated_capital: float) -> Optional[Dict]
     }
 
 
+ALLOCATION_STRATEGIES = {
+    AllocationStrategy.EQUAL: equal_weight_allocation,
+}
+
+
 def allocate_capital(
     opportunities: List[Dict],
     total_capital: float,
     strategy: AllocationStrategy = AllocationStrategy.EQUAL
 ) -> Dict:
-    if strategy == AllocationStrategy.EQUAL:
-        allocations = equal_weight_allocation(opportunities, total_capital)
-
     validated_allocations = []
     total_deployed = 0
     total_expected_profit = 0
 
-    for allocation in allocations:
-        bet_details = calculate_bet_amounts(
-            allocation['opportunity'],
-            allocation['allocated_capital']
-        )
+    # Size each bet as the strategy yields it, so only validated allocations are ever built
+    for opp, allocated_capital in ALLOCATION_STRATEGIES[strategy](opportunities, total_capital):
+        bet_details = calculate_bet_amounts(opp, allocated_capital)
 
         if bet_details:
-            allocation['bet_details'] = bet_details
-            validated_allocations.append(allocation)
+            validated_allocations.append({
+                'opportunity': opp,
+                'allocated_capital': allocated_capital,
+                'bet_details': bet_details
+            })
             total_deployed += bet_details['allocated_capital']
             total_expected_profit += bet_details['expected_profit']
 
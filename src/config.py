@@ -1,8 +1,9 @@
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Mapping, Optional
 
 
-# polymarket slug to opinion market ID mapping
-MARKET_CONFIGS: Dict[str, Optional[int]] = {
+# polymarket slug to opinion market ID mapping (read-only, shared by worker threads)
+MARKET_CONFIGS: Mapping[str, Optional[int]] = MappingProxyType({
     # these slugs appears in predict dot fun and opinion markets
     # "metamask-fdv-above-one-day-after-launch": 189,
     # "edgex-fdv-above-one-day-after-launch": 98,
@@ -21,9 +22,15 @@ MARKET_CONFIGS: Dict[str, Optional[int]] = {
     # "usdai-fdv-above-one-day-after-launch": 183,
     # "standx-fdv-above-one-day-after-launch": 96,
     # "what-price-will-bitcoin-hit-in-january-2026": 246
-}
+})
 
 POLYMARKET_API_EVENTS_URL = "https://gamma-api.polymarket.com/events"
 OPINION_API_DATA_URL = "https://openapi.opinion.trade/openapi/market/categorical/{marketId}"
 OPINION_TOKEN_URL = "https://openapi.opinion.trade/openapi/token/latest-price"
 OPINION_ORDERBOOK_URL = "https://openapi.opinion.trade/openapi/token/orderbook"
+
+# Client-side request rate caps shared by all worker threads of each API client.
+# Neither API publishes a limit; these match the ceiling of the previous 100ms
+# per-request sleep (10 predict.fun / 20 Opinion workers), and 429s are retried
+PREDICT_DOT_FUN_REQUESTS_PER_SECOND = 100
+OPINION_REQUESTS_PER_SECOND = 200
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_CONNECTIONS = 50
+POOL_MAXSIZE = 50
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# Seconds to wait on connect/read so a stalled request can't hold a worker thread forever
+REQUEST_TIMEOUT = 10
+
+
+def create_session() -> requests.Session:
+    retries = Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({"GET", "POST"})
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retries)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
+# Shared across all API modules and worker threads so keep-alive connections are reused
+SESSION = create_session()
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Reserve the next free slot under the lock, then wait for it outside so other threads aren't blocked
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
@@ -3,9 +3,13 @@ Market Arbitrage Analyzer
 This script compares prices from two different prediction markets and identifies arbitrage opportunities.
 """
 
+import heapq
+import os
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
 from dateutil import parser as date_parser
 
 from dotenv import load_dotenv
@@ -14,73 +18,48 @@ load_dotenv()
 from predict_dot_fun import get_predict_dot_fun_data
 from opinion import get_opinion_data
 from report_generation import generate_excel_report
-from polymarket import fetch_polymarket_events, extract_market_info, fetch_polymarket_orderbooks, extract_orderbook_depth
+from polymarket import fetch_polymarket_events, extract_market_info, fetch_polymarket_orderbooks, extract_orderbook_depth, YES_DEPTH_KEYS, NO_DEPTH_KEYS
 
 BASE_DIR = Path(__file__).parent.parent
 REPORT_DIR = BASE_DIR / "results"
 EXCEL_OUTPUT_PATH = REPORT_DIR / "arbitrage_report.xlsx"
 
 
-def get_price_from_lookup(market: Dict, price_lookup: Dict[str, Dict], match_by_slug: bool = False) -> Optional[Dict]:
-    """Validate and return prices for the given Polymarket market from any price lookup."""
-    
-    if match_by_slug:
-        # For Opinion.trade: match by category_slug + title since condition IDs differ
-        category_slug = market.get('category_slug', '')
-        market_title = market.get('title', '')
-        
-        # Try exact match first
-        market_key = f"{category_slug}||{market_title}"
-        lookup = price_lookup.get(market_key)
-        
-        if not lookup:
-            # Try fuzzy matching by searching for markets with same slug and title
-            for key, value in price_lookup.items():
-                opinion_market_title = value.get('market_title', '')
-                opinion_slug = value.get('polymarket_slug', '')
-                if opinion_slug == category_slug and opinion_market_title == market_title:
-                    lookup = value
-                    break
+def find_by_title_date(market: Dict, price_lookup: Dict[Tuple[str, str], Dict]) -> Optional[Dict]:
+    # For Opinion.trade: fallback when the exact (category_slug, title) key misses
+    category_slug = market.get('category_slug', '')
+    market_title = market.get('title', '')
+
+    # Try date-based matching: parse titles as dates and compare
+    try:
+        # Parse Polymarket title as date (e.g., "December 31" or "June 30")
+        polymarket_date = date_parser.parse(market_title, default=datetime(2026, 1, 1))
         
-        if not lookup:
-            # Try date-based matching: parse titles as dates and compare
+        for key, value in price_lookup.items():
+            opinion_market_title = value.get('market_title', '')
+            opinion_slug = value.get('polymarket_slug', '')
+            
+            # Only try date matching if slug matches
+            if opinion_slug != category_slug:
+                continue
+            
             try:
-                # Parse Polymarket title as date (e.g., "December 31" or "June 30")
-                polymarket_date = date_parser.parse(market_title, default=datetime(2026, 1, 1))
+                # Parse Opinion title as date (e.g., "March 31, 2026")
+                opinion_date = date_parser.parse(opinion_market_title)
                 
-                for key, value in price_lookup.items():
-                    opinion_market_title = value.get('market_title', '')
-                    opinion_slug = value.get('polymarket_slug', '')
-                    
-                    # Only try date matching if slug matches
-                    if opinion_slug != category_slug:
-                        continue
-                    
-                    try:
-                        # Parse Opinion title as date (e.g., "March 31, 2026")
-                        opinion_date = date_parser.parse(opinion_market_title)
-                        
-                        # Compare dates (ignoring time)
-                        if polymarket_date.date() == opinion_date.date():
-                            lookup = value
-                            break
-                    except (ValueError, TypeError):
-                        continue
+                # Compare dates (ignoring time)
+                if polymarket_date.date() == opinion_date.date():
+                    return value
             except (ValueError, TypeError):
-                pass
-        
-        if not lookup:
-            return None
-    else:
-        # For predict.fun: match by condition ID
-        condition_id = market.get('conditionId')
-        if not condition_id:
-            return None
-        
-        lookup = price_lookup.get(condition_id)
-        if not lookup:
-            return None
+                continue
+    except (ValueError, TypeError):
+        pass
+
+    return None
 
+
+def build_market2_data(market: Dict, lookup: Dict) -> Optional[Dict]:
+    """Validate a price lookup entry and return its prices for the given Polymarket market."""
     yes_price = lookup.get('yes_price')
     no_price = lookup.get('no_price')
 
@@ -90,9 +69,9 @@ def get_price_from_lookup(market: Dict, price_lookup: Dict[str, Dict], match_by_
     return {
         'market_id': lookup.get('market_id') or market.get('id'),
         'source': lookup.get('source', 'predict.fun'),
-        'yes_price': float(yes_price),
-        'no_price': float(no_price),
-        'timestamp': lookup.get('timestamp') or datetime.utcnow().isoformat()
+        'yes_price': yes_price,
+        'no_price': no_price,
+        'timestamp': lookup['timestamp']
     }
 
 
@@ -130,11 +109,25 @@ def calculate_arbitrage(market1_prices: List[float], market2_prices: Dict) -> Di
     # Determine if there's an arbitrage opportunity
     arbitrage_exists = profit_strategy1 > 0 or profit_strategy2 > 0
 
-    # Create strategy1 dictionary (always created regardless of profitability)
+    # Callers only keep opportunities, so skip building strategy details for the rest
+    if not arbitrage_exists:
+        return {
+            'arbitrage_exists': False,
+            'market1_yes': yes_price_m1,
+            'market1_no': no_price_m1,
+            'market2_yes': yes_price_m2,
+            'market2_no': no_price_m2,
+            'strategy1': None,
+            'strategy2': None,
+            'best_strategy': None
+        }
+
+    # Create strategy1 dictionary (always created for opportunities regardless of profitability)
     shares_yes_s1 = 1.0 / yes_price_m1 if yes_price_m1 > 0 else 0
     shares_no_s1 = 1.0 / no_price_m2 if no_price_m2 > 0 else 0
     strategy1 = {
         'type': 'Yes on App1, No on App2',
+        'strategy_code': 0,
         'cost': cost_strategy1,
         'profit': profit_strategy1,
         'roi_percent': roi_strategy1,
@@ -142,11 +135,12 @@ def calculate_arbitrage(market1_prices: List[float], market2_prices: Dict) -> Di
         'action_app2': f"Buy {shares_no_s1:.2f} shares of NO @ ${no_price_m2:.3f}"
     }
 
-    # Create strategy2 dictionary (always created regardless of profitability)
+    # Create strategy2 dictionary (always created for opportunities regardless of profitability)
     shares_no_s2 = 1.0 / no_price_m1 if no_price_m1 > 0 else 0
     shares_yes_s2 = 1.0 / yes_price_m2 if yes_price_m2 > 0 else 0
     strategy2 = {
         'type': 'No on App1, Yes on App2',
+        'strategy_code': 1,
         'cost': cost_strategy2,
         'profit': profit_strategy2,
         'roi_percent': roi_strategy2,
@@ -155,11 +149,8 @@ def calculate_arbitrage(market1_prices: List[float], market2_prices: Dict) -> Di
     }
 
     # Determine best strategy for backward compatibility
-    best_strategy = None
-    if profit_strategy1 > profit_strategy2 and profit_strategy1 > 0:
-        best_strategy = strategy1
-    elif profit_strategy2 > 0:
-        best_strategy = strategy2
+    # At least one strategy is profitable here, so the more profitable one is always the best
+    best_strategy = strategy1 if profit_strategy1 > profit_strategy2 else strategy2
 
     return {
         'arbitrage_exists': arbitrage_exists,
@@ -173,50 +164,22 @@ def calculate_arbitrage(market1_prices: List[float], market2_prices: Dict) -> Di
     }
 
 
-def calculate_orderbook_roi(strategy_type: str, market2_prices: Dict, orderbook_data: Dict) -> Optional[float]:
-    if not orderbook_data:
-        return None
-
-    yes_price_m2 = market2_prices['yes_price']
-    no_price_m2 = market2_prices['no_price']
-
+def calculate_orderbook_roi(strategy_type: str, platform1_orderbook: Optional[Dict], platform2_orderbook: Optional[Dict], platform1_prices: Dict, platform2_prices: Dict, ask_level: int = 1) -> Optional[float]:
     if 'Yes on App1, No on App2' in strategy_type:
-        yes_ask1 = orderbook_data.get('yes_ask1_price')
-        if yes_ask1 is None:
-            return None
-        cost = yes_ask1 + no_price_m2
-    else:
-        no_ask1 = orderbook_data.get('no_ask1_price')
-        if no_ask1 is None:
-            return None
-        cost = no_ask1 + yes_price_m2
-
-    if cost <= 0:
-        return None
-
-    profit = 1.0 - cost
-    roi = (profit / cost * 100)
-    return roi
+        outcome_p1, outcome_p2 = 'yes', 'no'
+    else:  # 'No on App1, Yes on App2'
+        outcome_p1, outcome_p2 = 'no', 'yes'
 
+    # Use the ask at the requested level from each platform if available, else fallback to midpoint
+    price_p1 = platform1_orderbook.get(f'{outcome_p1}_ask{ask_level}_price') if platform1_orderbook else None
+    if price_p1 is None:
+        price_p1 = platform1_prices.get(f'{outcome_p1}_price')
 
-def calculate_orderbook_roi_ask2(strategy_type: str, market2_prices: Dict, orderbook_data: Dict) -> Optional[float]:
-    if not orderbook_data:
-        return None
-
-    yes_price_m2 = market2_prices['yes_price']
-    no_price_m2 = market2_prices['no_price']
-
-    if 'Yes on App1, No on App2' in strategy_type:
-        yes_ask2 = orderbook_data.get('yes_ask2_price')
-        if yes_ask2 is None:
-            return None
-        cost = yes_ask2 + no_price_m2
-    else:
-        no_ask2 = orderbook_data.get('no_ask2_price')
-        if no_ask2 is None:
-            return None
-        cost = no_ask2 + yes_price_m2
+    price_p2 = platform2_orderbook.get(f'{outcome_p2}_ask{ask_level}_price') if platform2_orderbook else None
+    if price_p2 is None:
+        price_p2 = platform2_prices.get(f'{outcome_p2}_price')
 
+    cost = price_p1 + price_p2
     if cost <= 0:
         return None
 
@@ -225,87 +188,49 @@ def calculate_orderbook_roi_ask2(strategy_type: str, market2_prices: Dict, order
     return roi
 
 
-def calculate_orderbook_roi_combined_ask1(strategy_type: str, platform1_orderbook: Optional[Dict], platform2_orderbook: Optional[Dict], platform1_prices: Dict, platform2_prices: Dict) -> Optional[float]:
-    yes_price_p1 = platform1_prices.get('yes_price')
-    no_price_p1 = platform1_prices.get('no_price')
-    yes_price_p2 = platform2_prices.get('yes_price')
-    no_price_p2 = platform2_prices.get('no_price')
+# Opportunities carry their best ROI flat, so sort keys skip the nested strategy dicts
+get_best_roi = itemgetter('roi_sort_key')
 
-    if 'Yes on App1, No on App2' in strategy_type:
-        # Use Ask1 price from platform1 if available, else fallback to midpoint
-        if platform1_orderbook and platform1_orderbook.get('yes_ask1_price') is not None:
-            price_p1 = platform1_orderbook['yes_ask1_price']
-        else:
-            price_p1 = yes_price_p1
-        
-        # Use Ask1 price from platform2 if available, else fallback to midpoint
-        if platform2_orderbook and platform2_orderbook.get('no_ask1_price') is not None:
-            price_p2 = platform2_orderbook['no_ask1_price']
-        else:
-            price_p2 = no_price_p2
-    else:  # 'No on App1, Yes on App2'
-        # Use Ask1 price from platform1 if available, else fallback to midpoint
-        if platform1_orderbook and platform1_orderbook.get('no_ask1_price') is not None:
-            price_p1 = platform1_orderbook['no_ask1_price']
-        else:
-            price_p1 = no_price_p1
-        
-        # Use Ask1 price from platform2 if available, else fallback to midpoint
-        if platform2_orderbook and platform2_orderbook.get('yes_ask1_price') is not None:
-            price_p2 = platform2_orderbook['yes_ask1_price']
-        else:
-            price_p2 = yes_price_p2
 
-    cost = price_p1 + price_p2
-    if cost <= 0:
-        return None
+def attach_polymarket_orderbook(opp: Dict, orderbook_lookup: Dict[str, Dict]):
+    clob_tokens = opp['market'].get('clobTokenIds', [])
+    if len(clob_tokens) < 2:
+        return
 
-    profit = 1.0 - cost
-    roi = (profit / cost * 100)
-    return roi
+    outcome_prices = opp['market']['outcomePrices']
+    orderbook_data = {}
 
+    for token_id, price, depth_keys in (
+        (clob_tokens[0], outcome_prices[0], YES_DEPTH_KEYS),
+        (clob_tokens[1], outcome_prices[1], NO_DEPTH_KEYS)
+    ):
+        if token_id in orderbook_lookup:
+            depth = extract_orderbook_depth(orderbook_lookup[token_id], price)
+            if depth:
+                orderbook_data.update((depth_keys[k], v) for k, v in depth.items())
 
-def calculate_orderbook_roi_combined_ask2(strategy_type: str, platform1_orderbook: Optional[Dict], platform2_orderbook: Optional[Dict], platform1_prices: Dict, platform2_prices: Dict) -> Optional[float]:
-    yes_price_p1 = platform1_prices.get('yes_price')
-    no_price_p1 = platform1_prices.get('no_price')
-    yes_price_p2 = platform2_prices.get('yes_price')
-    no_price_p2 = platform2_prices.get('no_price')
+    if orderbook_data:
+        opp['polymarket_orderbook'] = orderbook_data
 
-    if 'Yes on App1, No on App2' in strategy_type:
-        # Use Ask2 price from platform1 if available, else fallback to midpoint
-        if platform1_orderbook and platform1_orderbook.get('yes_ask2_price') is not None:
-            price_p1 = platform1_orderbook['yes_ask2_price']
-        else:
-            price_p1 = yes_price_p1
-        
-        # Use Ask2 price from platform2 if available, else fallback to midpoint
-        if platform2_orderbook and platform2_orderbook.get('no_ask2_price') is not None:
-            price_p2 = platform2_orderbook['no_ask2_price']
-        else:
-            price_p2 = no_price_p2
-    else:  # 'No on App1, Yes on App2'
-        # Use Ask2 price from platform1 if available, else fallback to midpoint
-        if platform1_orderbook and platform1_orderbook.get('no_ask2_price') is not None:
-            price_p1 = platform1_orderbook['no_ask2_price']
-        else:
-            price_p1 = no_price_p1
-        
-        # Use Ask2 price from platform2 if available, else fallback to midpoint
-        if platform2_orderbook and platform2_orderbook.get('yes_ask2_price') is not None:
-            price_p2 = platform2_orderbook['yes_ask2_price']
-        else:
-            price_p2 = yes_price_p2
 
-    cost = price_p1 + price_p2
-    if cost <= 0:
-        return None
+def attach_orderbook_rois(opp: Dict, platform1_orderbook: Optional[Dict], platform2_orderbook: Optional[Dict]):
+    # Build platform price dicts once for all four combined ROI calculations
+    outcome_prices = opp['market']['outcomePrices']
+    platform1_prices = {'yes_price': outcome_prices[0], 'no_price': outcome_prices[1]}
+    platform2_prices = opp['market2_data']
 
-    profit = 1.0 - cost
-    roi = (profit / cost * 100)
-    return roi
+    for strategy_key in ('strategy1', 'strategy2'):
+        strategy_type = opp['arbitrage'][strategy_key]['type']
+        for ask_level, roi_key in ((1, f'{strategy_key}_orderbook_roi_percent'), (2, f'{strategy_key}_orderbook_roi_ask2_percent')):
+            orderbook_roi = calculate_orderbook_roi(
+                strategy_type, platform1_orderbook, platform2_orderbook,
+                platform1_prices, platform2_prices, ask_level
+            )
+            if orderbook_roi is not None:
+                opp[roi_key] = orderbook_roi
 
 
-def find_opinion_predict_matches(opinion_price_lookup: Dict[str, Dict], predict_price_lookup: Dict[str, Dict], polymarket_markets: List[Dict]) -> List[Dict]:
+def find_opinion_predict_matches(opinion_price_lookup: Dict[Tuple[str, str], Dict], predict_price_lookup: Dict[str, Dict], polymarket_markets: List[Dict]) -> List[Dict]:
     """
     Match Opinion markets with predict.fun markets using Polymarket data as intermediary.
     For each Polymarket market, check if it exists in both Opinion and predict.fun.
@@ -313,23 +238,10 @@ def find_opinion_predict_matches(opinion_price_lookup: Dict[str, Dict], predict_
     """
     matches = []
     
-    # Build lookup for predict.fun by conditionId
-    predict_by_condition_id = {}
-    for condition_id, predict_data in predict_price_lookup.items():
-        predict_by_condition_id[condition_id] = predict_data
-    
-    # Build lookup for Opinion by slug||title
-    opinion_by_slug_title = {}
-    for opinion_key, opinion_data in opinion_price_lookup.items():
-        opinion_by_slug_title[opinion_key] = opinion_data
-    
     # Go through each Polymarket category and its markets
     for category in polymarket_markets:
-        category_slug = category['slug']
         for market in category.get('markets', []):
-            if market.get('closed'):
-                continue
-            
+            category_slug = market['category_slug']
             condition_id = market.get('conditionId')
             market_title = market.get('title')
             
@@ -337,13 +249,12 @@ def find_opinion_predict_matches(opinion_price_lookup: Dict[str, Dict], predict_
                 continue
             
             # Check if this market exists in predict.fun
-            predict_data = predict_by_condition_id.get(condition_id)
+            predict_data = predict_price_lookup.get(condition_id)
             if not predict_data:
                 continue
             
             # Check if this market exists in Opinion
-            opinion_key = f"{category_slug}||{market_title}"
-            opinion_data = opinion_by_slug_title.get(opinion_key)
+            opinion_data = opinion_price_lookup.get((category_slug, market_title))
             if not opinion_data:
                 continue
             
@@ -359,46 +270,81 @@ def find_opinion_predict_matches(opinion_price_lookup: Dict[str, Dict], predict_
     return matches
 
 
-def analyze_markets(markets: List[Dict], price_lookup: Dict[str, Dict], match_by_slug: bool = False) -> List[Dict]:
-    """Analyze all markets for arbitrage opportunities."""
-    opportunities = []
+def analyze_markets(markets: List[Dict], predict_price_lookup: Dict[str, Dict], opinion_price_lookup: Dict[Tuple[str, str], Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Analyze all markets for arbitrage opportunities against predict.fun and Opinion.trade."""
+    predict_opportunities = []
+    opinion_opportunities = []
 
-    for market in markets:
-        # Skip closed markets or markets with invalid prices
-        if market['closed'] or not market['outcomePrices']:
-            continue
+    # Bind the dict lookups once; a helper is only called on a hit or for the Opinion date fallback
+    predict_get = predict_price_lookup.get
+    opinion_get = opinion_price_lookup.get
 
-        # Get prices from lookup
-        market2_data = get_price_from_lookup(market, price_lookup, match_by_slug)
-        if not market2_data:
+    # Each market is visited once and checked against both platforms
+    for market in markets:
+        # Skip markets with invalid prices (closed markets are dropped during extraction)
+        outcome_prices = market['outcomePrices']
+        if not outcome_prices:
             continue
 
-        # Calculate arbitrage
-        arbitrage_result = calculate_arbitrage(market['outcomePrices'], market2_data)
-
-        if arbitrage_result and arbitrage_result['arbitrage_exists']:
-            opportunities.append({
-                'market': market,
-                'market2_data': market2_data,
-                'arbitrage': arbitrage_result
-            })
+        # predict.fun: match by condition ID
+        condition_id = market.get('conditionId')
+        predict_entry = predict_get(condition_id) if condition_id else None
+        predict_data = build_market2_data(market, predict_entry) if predict_entry else None
+        if predict_data:
+            arbitrage_result = calculate_arbitrage(outcome_prices, predict_data)
+            if arbitrage_result and arbitrage_result['arbitrage_exists']:
+                predict_opportunities.append({
+                    'market': market,
+                    'market2_data': predict_data,
+                    'arbitrage': arbitrage_result,
+                    'roi_sort_key': arbitrage_result['best_strategy']['roi_percent']
+                })
+
+        # Opinion.trade: match by category_slug + title since condition IDs differ
+        opinion_entry = opinion_get((market.get('category_slug', ''), market.get('title', '')))
+        if not opinion_entry:
+            opinion_entry = find_by_title_date(market, opinion_price_lookup)
+        opinion_data = build_market2_data(market, opinion_entry) if opinion_entry else None
+        if opinion_data:
+            arbitrage_result = calculate_arbitrage(outcome_prices, opinion_data)
+            if arbitrage_result and arbitrage_result['arbitrage_exists']:
+                opinion_opportunities.append({
+                    'market': market,
+                    'market2_data': opinion_data,
+                    'arbitrage': arbitrage_result,
+                    'roi_sort_key': arbitrage_result['best_strategy']['roi_percent']
+                })
+
+    return predict_opportunities, opinion_opportunities
+
+
+def is_file_locked(path: Path) -> bool:
+    if not path.exists():
+        return False
+
+    if not os.access(path, os.W_OK):
+        return True
+
+    # Excel's lock on Windows isn't reflected in access bits, so only there fall back to opening the file
+    if os.name == 'nt':
+        try:
+            with open(path, 'r+b'):
+                pass
+        except PermissionError:
+            return True
 
-    return opportunities
+    return False
 
 
 def main():
     # Check if Excel file is open
-    if EXCEL_OUTPUT_PATH.exists():
-        try:
-            with open(EXCEL_OUTPUT_PATH, 'r+b') as f:
-                pass
-        except PermissionError:
-            print("\n" + "=" * 50)
-            print("ERROR: Excel file is currently open!")
-            print("=" * 50)
-            print(f"Please close the file: {EXCEL_OUTPUT_PATH}")
-            print("Then run the script again.")
-            return
+    if is_file_locked(EXCEL_OUTPUT_PATH):
+        print("\n" + "=" * 50)
+        print("ERROR: Excel file is currently open!")
+        print("=" * 50)
+        print(f"Please close the file: {EXCEL_OUTPUT_PATH}")
+        print("Then run the script again.")
+        return
 
     print("Market Arbitrage Analyzer")
     print("=" * 50)
@@ -412,6 +358,13 @@ def main():
         print(f"   ✗ Error fetching data: {e}")
         return
 
+    # Opinion.trade only depends on MARKET_CONFIGS, so load it in the background while
+    # predict.fun is fetched; its output is buffered and printed under step 4
+    opinion_log = []
+    opinion_executor = ThreadPoolExecutor(max_workers=1)
+    opinion_future = opinion_executor.submit(get_opinion_data, opinion_log.append)
+    opinion_executor.shutdown(wait=False)
+
     # Extract market information
     print("\n2. Extracting Polymarket information...")
     poly_cat_with_markets = extract_market_info(market_data)
@@ -424,42 +377,30 @@ def main():
     print(f"   ✓ Retrieved prices for {len(predict_price_lookup)} predict.fun markets")
 
     print("\n4. Loading Opinion.trade data...")
-    opinion_price_lookup = get_opinion_data()
+    try:
+        opinion_price_lookup = opinion_future.result()
+    finally:
+        for line in opinion_log:
+            print(line)
     print(f"   ✓ Retrieved data for {len(opinion_price_lookup)} Opinion.trade markets")
 
-    all_opportunities = []
-    all_opinion_opportunities = []
+    opportunities = []
+    opinion_opportunities = []
     total_markets = 0
 
     print("\n5. Analyzing markets for arbitrage opportunities...")
-    print("\n   Polymarket vs predict.fun:")
+
+    print("\n   Polymarket vs predict.fun / Opinion.trade:")
     for idx, polymarket_category in enumerate(poly_cat_with_markets, 1):
         markets = polymarket_category.get('markets', [])
         total_markets += len(markets)
         print(f"   - Category {idx}/{len(poly_cat_with_markets)}: {polymarket_category['slug']} ({len(markets)} markets)")
-        category_opportunities = analyze_markets(markets, predict_price_lookup)
-        all_opportunities.extend(category_opportunities)
+        predict_opportunities, category_opinion_opportunities = analyze_markets(markets, predict_price_lookup, opinion_price_lookup)
+        opportunities.extend(predict_opportunities)
+        opinion_opportunities.extend(category_opinion_opportunities)
 
-    opportunities = all_opportunities
     print(f"   ✓ Found {len(opportunities)} predict.fun arbitrage opportunities across {total_markets} markets")
-
-    print("\n   Polymarket vs Opinion.trade:")
-    opinion_total_markets = 0
-    for idx, polymarket_category in enumerate(poly_cat_with_markets, 1):
-        markets = polymarket_category.get('markets', [])
-        opinion_total_markets += len(markets)
-        
-        # Add category slug to each market for Opinion matching
-        category_slug = polymarket_category['slug']
-        for market in markets:
-            market['category_slug'] = category_slug
-        
-        print(f"   - Category {idx}/{len(poly_cat_with_markets)}: {category_slug} ({len(markets)} markets)")
-        category_opportunities = analyze_markets(markets, opinion_price_lookup, match_by_slug=True)
-        all_opinion_opportunities.extend(category_opportunities)
-
-    opinion_opportunities = all_opinion_opportunities
-    print(f"   ✓ Found {len(opinion_opportunities)} Opinion.trade arbitrage opportunities across {opinion_total_markets} markets")
+    print(f"   ✓ Found {len(opinion_opportunities)} Opinion.trade arbitrage opportunities across {total_markets} markets")
 
     print("\n   Opinion.trade vs predict.fun:")
     matched_pairs = find_opinion_predict_matches(opinion_price_lookup, predict_price_lookup, poly_cat_with_markets)
@@ -484,7 +425,8 @@ def main():
                     'closed': False
                 },
                 'market2_data': predict_data,
-                'arbitrage': arbitrage_result
+                'arbitrage': arbitrage_result,
+                'roi_sort_key': arbitrage_result['best_strategy']['roi_percent']
             })
     
     print(f"   ✓ Found {len(opinion_vs_predict_opportunities)} Opinion vs predict.fun arbitrage opportunities")
@@ -492,62 +434,29 @@ def main():
     # Fetch orderbooks for top 10 ROI opportunities
     print(f"\n6. Fetching Polymarket orderbooks for top 10 ROI opportunities...")
 
-    # Sort and get top 10 from Polymarket vs predict.fun
-    top10_polymarket_predict = sorted(
-        opportunities,
-        key=lambda x: x['arbitrage']['best_strategy']['roi_percent'] if x['arbitrage']['best_strategy'] else 0,
-        reverse=True
-    )[:10]
+    # Get top 10 from Polymarket vs predict.fun
+    top10_polymarket_predict = heapq.nlargest(10, opportunities, key=get_best_roi)
 
-    # Sort and get top 10 from Polymarket vs Opinion
-    top10_polymarket_opinion = sorted(
-        opinion_opportunities,
-        key=lambda x: x['arbitrage']['best_strategy']['roi_percent'] if x['arbitrage']['best_strategy'] else 0,
-        reverse=True
-    )[:10]
-
-    # Collect all unique token IDs needed
-    token_ids_to_fetch = set()
-    for opp in top10_polymarket_predict + top10_polymarket_opinion:
-        clob_tokens = opp['market'].get('clobTokenIds', [])
-        token_ids_to_fetch.update(clob_tokens)
+    # Get top 10 from Polymarket vs Opinion
+    top10_polymarket_opinion = heapq.nlargest(10, opinion_opportunities, key=get_best_roi)
+
+    # Collect all unique token IDs needed, sorted so identical inputs produce identical requests
+    token_ids_to_fetch = sorted({
+        token_id
+        for opp in top10_polymarket_predict + top10_polymarket_opinion
+        for token_id in opp['market'].get('clobTokenIds', [])
+    })
     
     # Fetch all orderbooks in one call
     orderbook_lookup = {}
     if token_ids_to_fetch:
-        orderbook_lookup = fetch_polymarket_orderbooks(list(token_ids_to_fetch))
+        orderbook_lookup = fetch_polymarket_orderbooks(token_ids_to_fetch)
         print(f"   ✓ Fetched {len(orderbook_lookup)} orderbooks")
     
     # Attach orderbook data to opportunities
     for opp in top10_polymarket_predict:
-        clob_tokens = opp['market'].get('clobTokenIds', [])
-        if clob_tokens and len(clob_tokens) >= 2:
-            yes_price = opp['market']['outcomePrices'][0]
-            no_price = opp['market']['outcomePrices'][1]
-            
-            orderbook_data = {}
-            
-            # Get YES token orderbook
-            yes_token_id = clob_tokens[0]
-            if yes_token_id in orderbook_lookup:
-                yes_orderbook = orderbook_lookup[yes_token_id]
-                yes_depth = extract_orderbook_depth(yes_orderbook, yes_price)
-                if yes_depth:
-                    # Prefix with 'yes_'
-                    orderbook_data.update({f'yes_{k}': v for k, v in yes_depth.items()})
-            
-            # Get NO token orderbook
-            no_token_id = clob_tokens[1]
-            if no_token_id in orderbook_lookup:
-                no_orderbook = orderbook_lookup[no_token_id]
-                no_depth = extract_orderbook_depth(no_orderbook, no_price)
-                if no_depth:
-                    # Prefix with 'no_'
-                    orderbook_data.update({f'no_{k}': v for k, v in no_depth.items()})
-            
-            if orderbook_data:
-                opp['polymarket_orderbook'] = orderbook_data
-        
+        attach_polymarket_orderbook(opp, orderbook_lookup)
+
         # Attach predict.fun orderbook depth
         condition_id = opp['market'].get('conditionId')
         predict_orderbook = None
@@ -556,75 +465,15 @@ def main():
             if predict_orderbook:
                 opp['predict_orderbook'] = predict_orderbook
         
-        # Build platform price dicts for combined ROI calculation
-        platform1_prices = {
-            'yes_price': opp['market']['outcomePrices'][0],
-            'no_price': opp['market']['outcomePrices'][1]
-        }
-        platform2_prices = opp['market2_data']
-        polymarket_orderbook = opp.get('polymarket_orderbook')
-
-        # Calculate orderbook ROI for strategy1
-        strategy1_type = opp['arbitrage']['strategy1']['type']
-        orderbook_roi_s1 = calculate_orderbook_roi_combined_ask1(
-            strategy1_type, polymarket_orderbook, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_s1 is not None:
-            opp['strategy1_orderbook_roi_percent'] = orderbook_roi_s1
-
-        orderbook_roi_ask2_s1 = calculate_orderbook_roi_combined_ask2(
-            strategy1_type, polymarket_orderbook, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_ask2_s1 is not None:
-            opp['strategy1_orderbook_roi_ask2_percent'] = orderbook_roi_ask2_s1
-
-        # Calculate orderbook ROI for strategy2
-        strategy2_type = opp['arbitrage']['strategy2']['type']
-        orderbook_roi_s2 = calculate_orderbook_roi_combined_ask1(
-            strategy2_type, polymarket_orderbook, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_s2 is not None:
-            opp['strategy2_orderbook_roi_percent'] = orderbook_roi_s2
-
-        orderbook_roi_ask2_s2 = calculate_orderbook_roi_combined_ask2(
-            strategy2_type, polymarket_orderbook, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_ask2_s2 is not None:
-            opp['strategy2_orderbook_roi_ask2_percent'] = orderbook_roi_ask2_s2
+        attach_orderbook_rois(opp, opp.get('polymarket_orderbook'), predict_orderbook)
 
     for opp in top10_polymarket_opinion:
-        clob_tokens = opp['market'].get('clobTokenIds', [])
-        if clob_tokens and len(clob_tokens) >= 2:
-            yes_price = opp['market']['outcomePrices'][0]
-            no_price = opp['market']['outcomePrices'][1]
-            
-            orderbook_data = {}
-            
-            yes_token_id = clob_tokens[0]
-            if yes_token_id in orderbook_lookup:
-                yes_orderbook = orderbook_lookup[yes_token_id]
-                yes_depth = extract_orderbook_depth(yes_orderbook, yes_price)
-                if yes_depth:
-                    orderbook_data.update({f'yes_{k}': v for k, v in yes_depth.items()})
-            
-            no_token_id = clob_tokens[1]
-            if no_token_id in orderbook_lookup:
-                no_orderbook = orderbook_lookup[no_token_id]
-                no_depth = extract_orderbook_depth(no_orderbook, no_price)
-                if no_depth:
-                    orderbook_data.update({f'no_{k}': v for k, v in no_depth.items()})
-            
-            if orderbook_data:
-                opp['polymarket_orderbook'] = orderbook_data
-        
+        attach_polymarket_orderbook(opp, orderbook_lookup)
+
         # Extract Opinion orderbook depth
         category_slug = opp['market'].get('category_slug', '')
         market_title = opp['market'].get('title', '')
-        opinion_key = f"{category_slug}||{market_title}"
+        opinion_key = (category_slug, market_title)
         
         opinion_orderbook = None
         if opinion_key in opinion_price_lookup:
@@ -632,52 +481,10 @@ def main():
             if opinion_orderbook:
                 opp['opinion_orderbook'] = opinion_orderbook
         
-        # Build platform price dicts for combined ROI calculation
-        platform1_prices = {
-            'yes_price': opp['market']['outcomePrices'][0],
-            'no_price': opp['market']['outcomePrices'][1]
-        }
-        platform2_prices = opp['market2_data']
-        polymarket_orderbook = opp.get('polymarket_orderbook')
-
-        # Calculate orderbook ROI for strategy1
-        strategy1_type = opp['arbitrage']['strategy1']['type']
-        orderbook_roi_s1 = calculate_orderbook_roi_combined_ask1(
-            strategy1_type, polymarket_orderbook, opinion_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_s1 is not None:
-            opp['strategy1_orderbook_roi_percent'] = orderbook_roi_s1
-
-        orderbook_roi_ask2_s1 = calculate_orderbook_roi_combined_ask2(
-            strategy1_type, polymarket_orderbook, opinion_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_ask2_s1 is not None:
-            opp['strategy1_orderbook_roi_ask2_percent'] = orderbook_roi_ask2_s1
-
-        # Calculate orderbook ROI for strategy2
-        strategy2_type = opp['arbitrage']['strategy2']['type']
-        orderbook_roi_s2 = calculate_orderbook_roi_combined_ask1(
-            strategy2_type, polymarket_orderbook, opinion_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_s2 is not None:
-            opp['strategy2_orderbook_roi_percent'] = orderbook_roi_s2
-
-        orderbook_roi_ask2_s2 = calculate_orderbook_roi_combined_ask2(
-            strategy2_type, polymarket_orderbook, opinion_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_ask2_s2 is not None:
-            opp['strategy2_orderbook_roi_ask2_percent'] = orderbook_roi_ask2_s2
+        attach_orderbook_rois(opp, opp.get('polymarket_orderbook'), opinion_orderbook)
 
     # Handle Opinion vs predict.fun top 10 opportunities
-    top10_opinion_predict = sorted(
-        opinion_vs_predict_opportunities,
-        key=lambda x: x['arbitrage']['best_strategy']['roi_percent'] if x['arbitrage']['best_strategy'] else 0,
-        reverse=True
-    )[:10]
+    top10_opinion_predict = heapq.nlargest(10, opinion_vs_predict_opportunities, key=get_best_roi)
 
     for opp in top10_opinion_predict:
         # Extract predict.fun orderbook depth from market2_data
@@ -687,45 +494,8 @@ def main():
         if predict_orderbook:
             opp['predict_orderbook'] = predict_orderbook
         
-        # Build platform price dicts
-        platform1_prices = {
-            'yes_price': opp['market']['outcomePrices'][0],
-            'no_price': opp['market']['outcomePrices'][1]
-        }
-        platform2_prices = opp['market2_data']
-        
-        # Calculate orderbook ROI for strategy1
         # Opinion has no orderbook, so only use predict.fun orderbook
-        strategy1_type = opp['arbitrage']['strategy1']['type']
-        orderbook_roi_s1 = calculate_orderbook_roi_combined_ask1(
-            strategy1_type, None, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_s1 is not None:
-            opp['strategy1_orderbook_roi_percent'] = orderbook_roi_s1
-
-        orderbook_roi_ask2_s1 = calculate_orderbook_roi_combined_ask2(
-            strategy1_type, None, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_ask2_s1 is not None:
-            opp['strategy1_orderbook_roi_ask2_percent'] = orderbook_roi_ask2_s1
-
-        # Calculate orderbook ROI for strategy2
-        strategy2_type = opp['arbitrage']['strategy2']['type']
-        orderbook_roi_s2 = calculate_orderbook_roi_combined_ask1(
-            strategy2_type, None, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_s2 is not None:
-            opp['strategy2_orderbook_roi_percent'] = orderbook_roi_s2
-
-        orderbook_roi_ask2_s2 = calculate_orderbook_roi_combined_ask2(
-            strategy2_type, None, predict_orderbook,
-            platform1_prices, platform2_prices
-        )
-        if orderbook_roi_ask2_s2 is not None:
-            opp['strategy2_orderbook_roi_ask2_percent'] = orderbook_roi_ask2_s2
+        attach_orderbook_rois(opp, None, predict_orderbook)
 
     # Generate report
     print(f"\n7. Generating Excel report...")
@@ -746,31 +516,19 @@ def main():
     print(f"\nPredict.fun arbitrage opportunities: {len(opportunities)}")
 
     if opportunities:
-        best_opp = max(
-            opportunities,
-            key=lambda x: x['arbitrage']['best_strategy']['roi_percent'] if x['arbitrage']['best_strategy'] else 0
-        )
-        best_roi = best_opp['arbitrage']['best_strategy']['roi_percent']
+        best_roi = get_best_roi(top10_polymarket_predict[0])
         print(f"  Best ROI: {best_roi:.2f}%")
 
     print(f"\nOpinion.trade arbitrage opportunities: {len(opinion_opportunities)}")
 
     if opinion_opportunities:
-        best_opp_opinion = max(
-            opinion_opportunities,
-            key=lambda x: x['arbitrage']['best_strategy']['roi_percent'] if x['arbitrage']['best_strategy'] else 0
-        )
-        best_roi_opinion = best_opp_opinion['arbitrage']['best_strategy']['roi_percent']
+        best_roi_opinion = get_best_roi(top10_polymarket_opinion[0])
         print(f"  Best ROI: {best_roi_opinion:.2f}%")
 
     print(f"\nOpinion vs predict.fun arbitrage opportunities: {len(opinion_vs_predict_opportunities)}")
 
     if opinion_vs_predict_opportunities:
-        best_opp_opinion_predict = max(
-            opinion_vs_predict_opportunities,
-            key=lambda x: x['arbitrage']['best_strategy']['roi_percent'] if x['arbitrage']['best_strategy'] else 0
-        )
-        best_roi_opinion_predict = best_opp_opinion_predict['arbitrage']['best_strategy']['roi_percent']
+        best_roi_opinion_predict = get_best_roi(top10_opinion_predict[0])
         print(f"  Best ROI: {best_roi_opinion_predict:.2f}%")
 
     print(f"\nReport saved:")
@@ -1,9 +1,12 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+from operator import itemgetter
+import heapq
 import requests
 import os
-import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import MARKET_CONFIGS, OPINION_API_DATA_URL, OPINION_TOKEN_URL, OPINION_ORDERBOOK_URL
+from config import MARKET_CONFIGS, OPINION_API_DATA_URL, OPINION_TOKEN_URL, OPINION_ORDERBOOK_URL, OPINION_REQUESTS_PER_SECOND
+from http_session import SESSION, REQUEST_TIMEOUT, RateLimiter
 
 
 API_KEY = os.getenv('OPINION_API_KEY')
@@ -12,18 +15,20 @@ HEADERS = {
     "Accept": "*/*"
 }
 
-def fetch_opinion_market_data(slug: str, market_id: int) -> Tuple[str, Optional[Dict]]:
+RATE_LIMITER = RateLimiter(OPINION_REQUESTS_PER_SECOND)
+
+def fetch_opinion_market_data(slug: str, market_id: int, log: Callable[[str], None] = print) -> Tuple[str, Optional[Dict]]:
     url = OPINION_API_DATA_URL.format(marketId=market_id)
     try:
-        response = requests.get(url, headers=HEADERS)
+        response = SESSION.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return (slug, response.json())
     except requests.exceptions.RequestException as e:
-        print(f"Error fetching Opinion market {market_id}: {e}")
+        log(f"Error fetching Opinion market {market_id}: {e}")
         return (slug, None)
 
 
-def extract_opinion_orderbook_depth(sorted_bids: List[Dict], sorted_asks: List[Dict]) -> Optional[Dict]:
+def extract_opinion_orderbook_depth(sorted_bids: List[Tuple[float, float]], sorted_asks: List[Tuple[float, float]]) -> Optional[Dict]:
     if not sorted_asks:
         return None
     
@@ -31,40 +36,36 @@ def extract_opinion_orderbook_depth(sorted_bids: List[Dict], sorted_asks: List[D
     
     # Extract Bid 1 (highest bid)
     if len(sorted_bids) > 0:
-        bid1_price = float(sorted_bids[0]['price'])
-        bid1_size = float(sorted_bids[0]['size'])
+        bid1_price, bid1_size = sorted_bids[0]
         result['bid1_price'] = bid1_price
         result['bid1_size_usd'] = bid1_price * bid1_size
     
     # Extract Bid 2 (second-highest bid)
     if len(sorted_bids) > 1:
-        bid2_price = float(sorted_bids[1]['price'])
-        bid2_size = float(sorted_bids[1]['size'])
+        bid2_price, bid2_size = sorted_bids[1]
         result['bid2_price'] = bid2_price
         result['bid2_size_usd'] = bid2_price * bid2_size
     
     # Extract Ask 1 (lowest ask)
     if len(sorted_asks) > 0:
-        ask1_price = float(sorted_asks[0]['price'])
-        ask1_size = float(sorted_asks[0]['size'])
+        ask1_price, ask1_size = sorted_asks[0]
         result['ask1_price'] = ask1_price
         result['ask1_size_usd'] = ask1_price * ask1_size
     
     # Extract Ask 2 (second-lowest ask)
     if len(sorted_asks) > 1:
-        ask2_price = float(sorted_asks[1]['price'])
-        ask2_size = float(sorted_asks[1]['size'])
+        ask2_price, ask2_size = sorted_asks[1]
         result['ask2_price'] = ask2_price
         result['ask2_size_usd'] = ask2_price * ask2_size
     
     return result if result else None
 
 
-def fetch_token_orderbook(token_id: str, token_type: str) -> Tuple[str, str, Optional[Dict]]:
-    time.sleep(0.1)
+def fetch_token_orderbook(token_id: str, token_type: str, log: Callable[[str], None] = print) -> Tuple[str, str, Optional[Dict]]:
     try:
-        response = requests.get(OPINION_ORDERBOOK_URL, headers=HEADERS, 
-                                params={"token_id": token_id})
+        RATE_LIMITER.acquire()
+        response = SESSION.get(OPINION_ORDERBOOK_URL, headers=HEADERS, 
+                                params={"token_id": token_id}, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
@@ -76,27 +77,29 @@ def fetch_token_orderbook(token_id: str, token_type: str) -> Tuple[str, str, Opt
         bids = result.get('bids', [])
         asks = result.get('asks', [])
         
-        # Sort orderbooks (Opinion returns unsorted data)
-        sorted_bids = sorted(bids, key=lambda x: float(x['price']), reverse=True)
-        sorted_asks = sorted(asks, key=lambda x: float(x['price']))
+        # Opinion returns unsorted data; only the top 2 levels are used, so select them instead of sorting
+        bid_levels = [(float(bid['price']), float(bid['size'])) for bid in bids]
+        ask_levels = [(float(ask['price']), float(ask['size'])) for ask in asks]
+        sorted_bids = heapq.nlargest(2, bid_levels, key=itemgetter(0))
+        sorted_asks = heapq.nsmallest(2, ask_levels, key=itemgetter(0))
         
         # Extract orderbook depth
         orderbook_depth = extract_opinion_orderbook_depth(sorted_bids, sorted_asks)
         
         return (token_id, token_type, orderbook_depth)
     except (requests.exceptions.RequestException, ValueError, KeyError) as e:
-        print(f"Error fetching orderbook for {token_id}: {e}")
+        log(f"Error fetching orderbook for {token_id}: {e}")
         return (token_id, token_type, None)
 
 
-def extract_opinion_markets() -> List[Dict]:
+def extract_opinion_markets(log: Callable[[str], None] = print) -> List[Dict]:
     all_markets = []
     
     opinion_markets = {slug: market_id for slug, market_id in MARKET_CONFIGS.items() if market_id is not None}
     
     with ThreadPoolExecutor(max_workers=10) as executor:
         future_to_market = {
-            executor.submit(fetch_opinion_market_data, slug, market_id): (slug, market_id)
+            executor.submit(fetch_opinion_market_data, slug, market_id, log): (slug, market_id)
             for slug, market_id in opinion_markets.items()
         }
         
@@ -157,15 +160,15 @@ def extract_opinion_markets() -> List[Dict]:
                     
                     all_markets.append(market_info)
                 
-                print(f"Fetched Opinion market: {slug} (ID: {market_id})")
+                log(f"Fetched Opinion market: {slug} (ID: {market_id})")
                 
             except Exception as e:
-                print(f"Error processing market {slug} ({market_id}): {e}")
+                log(f"Error processing market {slug} ({market_id}): {e}")
     
     return all_markets
 
 
-def get_opinion_price_lookup(opinion_markets: List[Dict]) -> Dict[str, Dict]:
+def get_opinion_price_lookup(opinion_markets: List[Dict], log: Callable[[str], None] = print) -> Dict[Tuple[str, str], Dict]:
     price_lookup = {}
     
     token_requests = []
@@ -177,11 +180,11 @@ def get_opinion_price_lookup(opinion_markets: List[Dict]) -> Dict[str, Dict]:
             token_requests.append((market, no_token_id, 'no'))
     
     prices_map = {}
-    print(f"\nFetching prices for {len(token_requests)} tokens in parallel...")
+    log(f"\nFetching prices for {len(token_requests)} tokens in parallel...")
     
     with ThreadPoolExecutor(max_workers=20) as executor:
         future_to_token = {
-            executor.submit(fetch_token_orderbook, token_id, token_type): (market, token_id, token_type)
+            executor.submit(fetch_token_orderbook, token_id, token_type, log): (market, token_id, token_type)
             for market, token_id, token_type in token_requests
         }
         
@@ -193,12 +196,15 @@ def get_opinion_price_lookup(opinion_markets: List[Dict]) -> Dict[str, Dict]:
                 token_id, token_type, orderbook_depth = future.result()
                 if orderbook_depth is not None:
                     prices_map[token_id] = orderbook_depth
-                    print(f"  [{completed}/{len(token_requests)}] Fetched {token_type} token for {market.get('market_title')}... ✓")
                 else:
-                    print(f"  [{completed}/{len(token_requests)}] Failed to fetch {token_type} token for {market.get('market_title')}")
+                    log(f"  [{completed}/{len(token_requests)}] Failed to fetch {token_type} token for {market.get('market_title')}")
             except Exception as e:
-                print(f"  [{completed}/{len(token_requests)}] Error processing {token_type} token for {market.get('market_title')}: {e}")
+                log(f"  [{completed}/{len(token_requests)}] Error processing {token_type} token for {market.get('market_title')}: {e}")
     
+    log(f"  ✓ Fetched {len(prices_map)}/{len(token_requests)} tokens")
+
+    fetched_at = datetime.utcnow().isoformat()
+
     for market in opinion_markets:
         yes_token_id = market.get('yes_token_id')
         no_token_id = market.get('no_token_id')
@@ -208,14 +214,14 @@ def get_opinion_price_lookup(opinion_markets: List[Dict]) -> Dict[str, Dict]:
         
         # Require at least ask1 for both YES and NO
         if yes_orderbook is None or no_orderbook is None:
-            print(f"Warning: Could not fetch orderbooks for market {market.get('market_title')}")
+            log(f"Warning: Could not fetch orderbooks for market {market.get('market_title')}")
             continue
         
         yes_ask1 = yes_orderbook.get('ask1_price')
         no_ask1 = no_orderbook.get('ask1_price')
         
         if yes_ask1 is None or no_ask1 is None:
-            print(f"Warning: Missing ask1 prices for market {market.get('market_title')}")
+            log(f"Warning: Missing ask1 prices for market {market.get('market_title')}")
             continue
         
         # Combine YES and NO orderbook depths with prefixes
@@ -225,8 +231,8 @@ def get_opinion_price_lookup(opinion_markets: List[Dict]) -> Dict[str, Dict]:
         for key, value in no_orderbook.items():
             orderbook_depth[f'no_{key}'] = value
         
-        # Use composite key: slug + market_title for matching
-        market_key = f"{market.get('polymarket_slug')}||{market.get('market_title')}"
+        # Use composite key: (slug, market_title) for matching
+        market_key = (market.get('polymarket_slug'), market.get('market_title'))
         
         price_lookup[market_key] = {
             'market_id': market.get('market_id'),
@@ -235,6 +241,7 @@ def get_opinion_price_lookup(opinion_markets: List[Dict]) -> Dict[str, Dict]:
             'source': 'opinion.trade',
             'yes_price': yes_ask1,
             'no_price': no_ask1,
+            'timestamp': fetched_at,
             'volume': market.get('volume'),
             'status': market.get('status_enum'),
             'orderbook_depth': orderbook_depth
@@ -243,11 +250,12 @@ def get_opinion_price_lookup(opinion_markets: List[Dict]) -> Dict[str, Dict]:
     return price_lookup
 
 
-def get_opinion_data() -> Dict[str, Dict]:
-    opinion_markets = extract_opinion_markets()
+def get_opinion_data(log: Callable[[str], None] = print) -> Dict[Tuple[str, str], Dict]:
+    # log defaults to print; pass e.g. list.append to buffer output when running in the background
+    opinion_markets = extract_opinion_markets(log)
     
-    print(f"\nLoaded {len(opinion_markets)} active Opinion markets")
+    log(f"\nLoaded {len(opinion_markets)} active Opinion markets")
     
-    price_lookup = get_opinion_price_lookup(opinion_markets)
+    price_lookup = get_opinion_price_lookup(opinion_markets, log)
     
     return price_lookup
\ No newline at end of file
@@ -1,23 +1,32 @@
 import requests
 import json
-from typing import List, Dict, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
 from config import MARKET_CONFIGS, POLYMARKET_API_EVENTS_URL
+from http_session import SESSION, REQUEST_TIMEOUT
 
 POLYMARKET_ORDERBOOK_URL = "https://clob.polymarket.com/books"
+POLYMARKET_ORDERBOOK_BATCH_SIZE = 100
+# MARKET_CONFIGS is read-only, so the event slugs can be built once at import
+POLYMARKET_EVENT_SLUGS = tuple(MARKET_CONFIGS.keys())
+
+# Keys returned by extract_orderbook_depth, mapped to their per-outcome names
+ORDERBOOK_DEPTH_KEYS = (
+    'bid1_price', 'bid1_size_usd', 'bid2_price', 'bid2_size_usd',
+    'ask1_price', 'ask1_size_usd', 'ask2_price', 'ask2_size_usd'
+)
+YES_DEPTH_KEYS = {key: f'yes_{key}' for key in ORDERBOOK_DEPTH_KEYS}
+NO_DEPTH_KEYS = {key: f'no_{key}' for key in ORDERBOOK_DEPTH_KEYS}
 
 
 def fetch_polymarket_events() -> List[Dict]:
-    try:
-        params = {"slug": list(MARKET_CONFIGS.keys())}
-        response = requests.get(POLYMARKET_API_EVENTS_URL, params=params)
-        response.raise_for_status()
-        
-        events = response.json()
-        
-        print(f"Fetched Polymarket events")
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching Polymarket events: {e}")
+    # Request errors propagate so main() aborts instead of reporting on an empty fetch
+    params = {"slug": POLYMARKET_EVENT_SLUGS}
+    response = SESSION.get(POLYMARKET_API_EVENTS_URL, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    
+    events = response.json()
+    
+    print(f"Fetched Polymarket events")
     
     return events
 
@@ -29,8 +38,13 @@ def extract_market_info(market_data: List[Dict]) -> List[Dict]:
         if 'markets' in item:
             category = {'slug': item['slug'], 'markets': []}
             for market in item['markets']:
+                # Closed markets can't be traded, so drop them before decoding their fields
+                if market.get('closed', False):
+                    continue
+
                 market_info = {
                     'id': market.get('id'),
+                    'category_slug': item['slug'],
                     'question': market.get('question'),
                     'title': market.get("groupItemTitle"),
                     'outcomes': json.loads(market.get('outcomes', '[]')),
@@ -51,52 +65,49 @@ def extract_market_info(market_data: List[Dict]) -> List[Dict]:
 
 def fetch_polymarket_orderbooks(clob_token_ids: List[str]) -> Dict[str, Dict]:
     """
-    Fetch orderbooks for multiple Polymarket token IDs using threading.
+    Fetch orderbooks for multiple Polymarket token IDs using batched /books requests.
     Returns dict mapping token_id to orderbook data with bids/asks.
     """
     if not clob_token_ids:
         return {}
     
     orderbook_lookup = {}
+    headers = {"Content-Type": "application/json"}
     
-    def fetch_single_orderbook(token_id: str) -> Optional[Dict]:
-        """Fetch orderbook for a single token ID."""
+    # /books accepts a list of token IDs, so one request covers a whole batch
+    for start in range(0, len(clob_token_ids), POLYMARKET_ORDERBOOK_BATCH_SIZE):
+        batch = clob_token_ids[start:start + POLYMARKET_ORDERBOOK_BATCH_SIZE]
+        payload = [{"token_id": token_id} for token_id in batch]
+        
         try:
-            payload = [{"token_id": token_id}]
-            headers = {"Content-Type": "application/json"}
-            
-            response = requests.post(POLYMARKET_ORDERBOOK_URL, json=payload, headers=headers, timeout=10)
+            response = SESSION.post(POLYMARKET_ORDERBOOK_URL, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            
             orderbooks = response.json()
-            if orderbooks and len(orderbooks) > 0:
-                return orderbooks[0]
-            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"   Warning: Failed to fetch orderbooks for {len(batch)} tokens: {e}")
+            continue
         
-        except requests.exceptions.RequestException as e:
-            print(f"   Warning: Failed to fetch orderbook for token {token_id[:16]}...: {e}")
-            return None
-    
-    # Use ThreadPoolExecutor to fetch orderbooks in parallel
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        # Submit all fetch tasks
-        future_to_token = {executor.submit(fetch_single_orderbook, token_id): token_id for token_id in clob_token_ids}
+        # Skip malformed payloads (e.g. an error object) so one bad batch doesn't abort the run
+        if not isinstance(orderbooks, list):
+            print(f"   Warning: Unexpected orderbook response for {len(batch)} tokens: {orderbooks!r}")
+            continue
         
-        # Collect results as they complete
-        for future in as_completed(future_to_token):
-            token_id = future_to_token[future]
-            try:
-                orderbook = future.result()
-                if orderbook:
-                    asset_id = orderbook.get('asset_id')
-                    if asset_id:
-                        orderbook_lookup[asset_id] = orderbook
-            except Exception as e:
-                print(f"   Warning: Error processing orderbook for token {token_id[:16]}...: {e}")
+        for orderbook in orderbooks:
+            if not isinstance(orderbook, dict):
+                continue
+            asset_id = orderbook.get('asset_id')
+            if asset_id:
+                orderbook_lookup[asset_id] = orderbook
     
     return orderbook_lookup
 
 
+def parse_orderbook_level(level: Dict) -> Tuple[Optional[float], Optional[float]]:
+    price = level.get('price')
+    size = level.get('size')
+    return (float(price) if price else None, float(size) if size else None)
+
+
 def extract_orderbook_depth(orderbook: Dict, target_price: float) -> Optional[Dict]:
     """
     Extract best and second-best bid/ask prices with sizes in USD (price * size).
@@ -105,49 +116,28 @@ def extract_orderbook_depth(orderbook: Dict, target_price: float) -> Optional[Di
     if not orderbook or 'bids' not in orderbook or 'asks' not in orderbook:
         return None
     
-    bids = orderbook.get('bids', [])
-    asks = orderbook.get('asks', [])
+    # The API can return null sides, so treat them as empty
+    bids = orderbook.get('bids') or []
+    asks = orderbook.get('asks') or []
     
     result = {}
     
-    # Get best bid (highest buy price) - first element in descending sorted list
-    if bids and len(bids) > 0:
-        bid_price = float(bids[-1]['price']) if bids[-1].get('price') else None
-        bid_size = float(bids[-1]['size']) if bids[-1].get('size') else None
-        
-        if bid_price is not None:
-            result['bid1_price'] = bid_price
-            if bid_size is not None:
-                result['bid1_size_usd'] = bid_price * bid_size
-    
-    # Get second-best bid
-    if bids and len(bids) > 1:
-        bid_price = float(bids[-2]['price']) if bids[-2].get('price') else None
-        bid_size = float(bids[-2]['size']) if bids[-2].get('size') else None
-        
-        if bid_price is not None:
-            result['bid2_price'] = bid_price
-            if bid_size is not None:
-                result['bid2_size_usd'] = bid_price * bid_size
-    
-    # Get best ask (lowest sell price) - first element in ascending sorted list
-    if asks and len(asks) > 0:
-        ask_price = float(asks[-1]['price']) if asks[-1].get('price') else None
-        ask_size = float(asks[-1]['size']) if asks[-1].get('size') else None
-        
-        if ask_price is not None:
-            result['ask1_price'] = ask_price
-            if ask_size is not None:
-                result['ask1_size_usd'] = ask_price * ask_size
+    # Best levels are at the end of each list (bids ascend, asks descend)
+    levels = (
+        ('bid1', bids, 1),
+        ('bid2', bids, 2),
+        ('ask1', asks, 1),
+        ('ask2', asks, 2),
+    )
     
-    # Get second-best ask
-    if asks and len(asks) > 1:
-        ask_price = float(asks[-2]['price']) if asks[-2].get('price') else None
-        ask_size = float(asks[-2]['size']) if asks[-2].get('size') else None
+    for name, side, level in levels:
+        if len(side) < level:
+            continue
         
-        if ask_price is not None:
-            result['ask2_price'] = ask_price
-            if ask_size is not None:
-                result['ask2_size_usd'] = ask_price * ask_size
+        price, size = parse_orderbook_level(side[-level])
+        if price is not None:
+            result[f'{name}_price'] = price
+            if size is not None:
+                result[f'{name}_size_usd'] = price * size
     
     return result if result else None
@@ -3,15 +3,19 @@ from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import os
-import time
 
 import requests
 
+from config import PREDICT_DOT_FUN_REQUESTS_PER_SECOND
+from http_session import SESSION, REQUEST_TIMEOUT, RateLimiter
+
 BASE_URL = "https://api.predict.fun/v1"
 
 PREDICT_DOT_FUN_API_KEY = os.environ.get('PREDICT_DOT_FUN_API_KEY')
 JWT_TOKEN = ""
 
+RATE_LIMITER = RateLimiter(PREDICT_DOT_FUN_REQUESTS_PER_SECOND)
+
 POLYMARKET_TO_PREDICT_DOT_FUN_CATEGORY_SLUGS = {
     "will-base-launch-a-token-in-2025-341": "will-base-launch-a-token-in-2026",
 }
@@ -30,14 +34,17 @@ def get_headers():
     return headers
 
 
+# Credentials are fixed for the run, so build the headers once and share them (read-only) across worker threads
+HEADERS = get_headers()
+
+
 def get_category_by_slug(slug: str):
     slug = POLYMARKET_TO_PREDICT_DOT_FUN_CATEGORY_SLUGS.get(slug, slug)
     endpoint = f"{BASE_URL}/categories/{slug}"
     
-    headers = get_headers()
     try:
-        time.sleep(0.1)
-        response = requests.get(endpoint, headers=headers)
+        RATE_LIMITER.acquire()
+        response = SESSION.get(endpoint, headers=HEADERS, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         
         data = response.json()
@@ -52,8 +59,8 @@ def get_market_orderbook(market_id: int) -> Optional[dict]:
     endpoint = f"{BASE_URL}/markets/{market_id}/orderbook"
     
     try:
-        time.sleep(0.1)
-        response = requests.get(endpoint, headers=get_headers())
+        RATE_LIMITER.acquire()
+        response = SESSION.get(endpoint, headers=HEADERS, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.json()
     
@@ -191,7 +198,6 @@ def fetch_market_prices(category_data: dict) -> List[Dict]:
     
     def fetch_single_market(market):
         market_id = market.get("id")
-        market_title = market.get("title")
         
         # Fetch orderbook for this market
         orderbook = get_market_orderbook(market_id)
@@ -213,7 +219,7 @@ def fetch_market_prices(category_data: dict) -> List[Dict]:
         if orderbook and orderbook.get("success"):
             market_with_prices["updateTimestamp"] = orderbook.get("data", {}).get("updateTimestampMs")
         
-        return market_with_prices, market_title
+        return market_with_prices
     
     markets_with_prices = []
     
@@ -227,13 +233,14 @@ def fetch_market_prices(category_data: dict) -> List[Dict]:
         for future in as_completed(future_to_market):
             completed += 1
             try:
-                market_with_prices, market_title = future.result()
+                market_with_prices = future.result()
                 markets_with_prices.append(market_with_prices)
-                print(f"  [{completed}/{len(markets)}] Fetched {market_title}... ✓")
             except Exception as e:
                 market = future_to_market[future]
                 print(f"  [{completed}/{len(markets)}] Error fetching {market.get('title')}: {e}")
     
+    print(f"  ✓ Fetched {len(markets_with_prices)}/{len(markets)} markets")
+
     return markets_with_prices
 
 
@@ -265,17 +272,26 @@ def display_category_with_prices(category_data: dict, markets_with_prices: List[
         print("-" * 100)
 
 
+def fetch_categories(slugs: list) -> Dict[str, Optional[dict]]:
+    # Category requests are independent, so fetch them in parallel; map() keeps slug order
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        return dict(zip(slugs, executor.map(get_category_by_slug, slugs)))
+
+
 def get_predict_dot_fun_data(slugs: list):
     price_lookup: Dict[str, Dict] = {}
 
+    categories = fetch_categories(slugs)
+
     for slug in slugs:
-        category_data = get_category_by_slug(slug)
+        category_data = categories[slug]
 
         if not (category_data and category_data.get("success")):
             print(f"Failed to retrieve category data for slug: {slug}")
             continue
 
         markets_with_prices = fetch_market_prices(category_data)
+        fetched_at = datetime.utcnow().isoformat()
 
         for market in markets_with_prices:
             polymarket_condition_ids = market.get("polymarketConditionIds", [])
@@ -295,7 +311,7 @@ def get_predict_dot_fun_data(slugs: list):
                 "yes_price": float(yes_buy),
                 "no_price": float(no_buy),
                 "source": "predict.fun",
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": fetched_at,
                 "category_slug": market.get("categorySlug"),
                 "market_title": market.get("title"),
                 "orderbook_depth": orderbook_depth
@@ -1,3 +1,4 @@
+from operator import itemgetter
 from typing import List, Dict, Optional
 
 from openpyxl import Workbook
@@ -49,6 +50,7 @@ class SheetBuilder:
                 'market2_data': opp['market2_data'],
                 'arbitrage': arb,
                 'strategy': arb['strategy1'],
+                'roi_percent': arb['strategy1']['roi_percent'] if arb['strategy1'] else 0,
                 'polymarket_orderbook': opp.get('polymarket_orderbook'),
                 'predict_orderbook': opp.get('predict_orderbook'),
                 'opinion_orderbook': opp.get('opinion_orderbook'),
@@ -63,6 +65,7 @@ class SheetBuilder:
                 'market2_data': opp['market2_data'],
                 'arbitrage': arb,
                 'strategy': arb['strategy2'],
+                'roi_percent': arb['strategy2']['roi_percent'] if arb['strategy2'] else 0,
                 'polymarket_orderbook': opp.get('polymarket_orderbook'),
                 'predict_orderbook': opp.get('predict_orderbook'),
                 'opinion_orderbook': opp.get('opinion_orderbook'),
@@ -71,12 +74,9 @@ class SheetBuilder:
             }
             strategy_rows.append(strategy2_row)
 
-        # Sort all strategy rows by their individual ROI
-        return sorted(
-            strategy_rows,
-            key=lambda x: x['strategy']['roi_percent'] if x['strategy'] else 0,
-            reverse=True
-        )
+        # Sort all strategy rows by their individual ROI, captured once per row above
+        strategy_rows.sort(key=itemgetter('roi_percent'), reverse=True)
+        return strategy_rows
     
     def _build_headers(self, platform1_name: str, platform2_name: str, include_orderbook: bool = False, include_platform2_orderbook: bool = False) -> List[str]:
         headers = [